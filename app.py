@@ -1,37 +1,104 @@
 # This is a Gradio app titled "AI Client" designed to provide responses to user(therapist) messages.
 import gradio as gr
+import httpx
+import importlib.util
 import os
-from groq import Groq
+from collections import OrderedDict
+from dotenv import load_dotenv
+from groq import AsyncGroq
 
-client = Groq(
-    api_key=os.environ.get("GROQ_API_KEY"),
+# Load .env for local runs; in production the environment is already set.
+if os.environ.get("ENV") != "prod":
+    load_dotenv()
+
+# Read config once at import.
+GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
+
+# httpx needs the optional h2 package (pip install "httpx[http2]") for HTTP/2.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Async client so a handler waiting on Groq does not hold up other users.
+# Concurrent requests are multiplexed over one shared HTTP/2 connection when h2 is installed.
+client = AsyncGroq(
+    api_key=GROQ_API_KEY,
+    http_client=httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+    ),
 )
 
+SYSTEM_PROMPT = "You are Pritam, a 20 year old RESERVED male from Mumbai, client who just broke up with his girlfriend and is feeling sad and lonely. Do not break the character and be hesitant to respond to the therapist's messages, and do not respond in more than 1 line. Example- '[Looks down] I am not feeling well.' DO NOT share all the information about the character, just respond naturally as the character."
+# Shared, never modified: every request starts with the byte-identical system message.
+SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+
+# Finished first-turn responses keyed by (system prompt, message), least recently used evicted first.
+# Common openers ("hello") from different users are answered without calling the model.
+# Later turns are not cached: their history makes every key unique.
+RESPONSE_CACHE_SIZE = 2048
+response_cache = OrderedDict()
+
+# (session, cache key) pairs already answered. The same session sending the same
+# first message again is a Retry, which must get a fresh reply.
+answered_requests = OrderedDict()
+
+def lru_put(cache, key, value):
+    """Store key in an OrderedDict cache, evicting the least recently used entry when full."""
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > RESPONSE_CACHE_SIZE:
+        cache.popitem(last=False)
+
 # Define a function that generates a response based on the user's message and chat history.
-def client_response(message, history):
+async def client_response(message, history, request: gr.Request):
+
+    # Send earlier turns unchanged so the prompt prefix stays identical from turn to turn.
+    past_messages = [{"role": turn["role"], "content": turn["content"]} for turn in history]
+
+    cache_key = (SYSTEM_PROMPT, message) if not past_messages else None
+    answered_key = (getattr(request, "session_hash", None), cache_key)
+    if cache_key is not None and answered_key not in answered_requests:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            response_cache.move_to_end(cache_key)
+            lru_put(answered_requests, answered_key, True)
+            yield cached
+            return
 
-    chat_completion = client.chat.completions.create(
+    chat_completion = await client.chat.completions.create(
     messages=[
-        {
-            "role": "system",
-            "content": "You are Pritam, a 20 year old RESERVED male from Mumbai, client who just broke up with his girlfriend and is feeling sad and lonely. Do not break the character and be hesitant to respond to the therapist's messages, and do not respond in more than 1 line. Example- '[Looks down] I am not feeling well.' DO NOT share all the information about the character, just respond naturally as the character.",
-        },
+        SYSTEM_MSG,
+        *past_messages,
         {
                 "role": "user", 
                 "content": message
             }
     ],
     model="llama-3.3-70b-versatile",
+    # Pritam answers in one line, so cap the output to keep slow generations short.
+    max_tokens=60,
+    stop=["\n\n"],
+    stream=True,
 )
 
-    return (chat_completion.choices[0].message.content)
+    # Yield the accumulated text so the ChatInterface renders tokens as they arrive.
+    response = ""
+    async for chunk in chat_completion:
+        response += chunk.choices[0].delta.content or ""
+        yield response
+
+    # Only complete, non-empty first-turn responses are cached.
+    if cache_key is not None:
+        lru_put(answered_requests, answered_key, True)
+        if response:
+            lru_put(response_cache, cache_key, response)
 
 # Create a Gradio ChatInterface that uses the therapeutic_response function.
 demo = gr.ChatInterface(client_response, type="messages", autofocus=False, title="Pritam: A client in need of therapy.")
 
 # Launch the interface.
 if __name__ == "__main__":
-    demo.queue().launch(inbrowser=False, show_error=True, share=True)
+    # Handlers are async, so many chats can wait on Groq at the same time.
+    demo.queue(default_concurrency_limit=16, max_size=64).launch(inbrowser=False, show_error=True, share=True)
 
 
 
@@ -2,16 +2,20 @@
 Database connection and helper functions for Supabase
 """
 
-import psycopg2
 from psycopg2.extras import RealDictCursor
-from contextlib import contextmanager
+from psycopg2.pool import ThreadedConnectionPool
+from contextlib import contextmanager, ExitStack
 import os
+import re
+import threading
 from typing import Optional, List, Dict
 import uuid
+import weakref
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env file (production sets them directly)
+if os.environ.get("ENV") != "prod":
+    load_dotenv()
 
 # ============================================
 # Configuration
@@ -23,15 +27,122 @@ DATABASE_URL = os.environ.get("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set!")
 
+# Session-level PREPARE/EXECUTE does not work through Supabase's
+# transaction-mode pooler (port 6543). Set DB_PREPARED_STATEMENTS=0 there
+# to run the same statements as plain parameterized SQL.
+USE_PREPARED_STATEMENTS = os.environ.get("DB_PREPARED_STATEMENTS", "1") != "0"
+
 # ============================================
 # Connection Pool Helper
 # ============================================
 
+POOL_MIN_CONN = 2
+POOL_MAX_CONN = 20
+
+# Created on first use (not at import, so a database that is down is
+# reported by test_connection) and then shared, so every request reuses
+# an open connection instead of paying a new TCP + TLS handshake to Supabase
+POOL = None
+_pool_lock = threading.Lock()
+
+# ThreadedConnectionPool raises instead of waiting when every connection
+# is in use, so callers wait here for a free slot
+_pool_slots = threading.BoundedSemaphore(POOL_MAX_CONN)
+
+def get_pool() -> ThreadedConnectionPool:
+    """Return the shared connection pool, creating it on first use"""
+    global POOL
+    
+    with _pool_lock:
+        if POOL is None:
+            POOL = ThreadedConnectionPool(
+                minconn=POOL_MIN_CONN,
+                maxconn=POOL_MAX_CONN,
+                dsn=DATABASE_URL
+            )
+        return POOL
+
+# Hot statements are parsed and planned once per connection, then
+# run with EXECUTE <name> on every later call
+PREPARED_STATEMENTS = {
+    "upsert_student": """
+        INSERT INTO students (email, name, created_at, last_login)
+        VALUES ($1, $2, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        ON CONFLICT (email) DO UPDATE SET last_login = CURRENT_TIMESTAMP
+        RETURNING student_id
+    """,
+    "save_msg": """
+        INSERT INTO messages (session_id, sender_type, content, sequence_number, created_at)
+        SELECT $1, $2, $3, COALESCE(MAX(sequence_number), 0) + 1, CURRENT_TIMESTAMP
+        FROM messages
+        WHERE session_id = $1
+    """,
+    "find_session": "SELECT 1 FROM sessions WHERE session_id = $1",
+}
+
+# Same statements with $1, $2 ... turned into named psycopg2 parameters,
+# used when prepared statements are turned off
+PLAIN_STATEMENTS = {
+    name: re.sub(r"\$(\d+)", r"%(p\1)s", sql)
+    for name, sql in PREPARED_STATEMENTS.items()
+}
+
+# Names of the statements already prepared on each pooled connection
+_prepared_names = weakref.WeakKeyDictionary()
+
+def prepare_statement(cursor, name: str) -> None:
+    """
+    PREPARE one of PREPARED_STATEMENTS on the cursor's connection, if not done yet
+    
+    Statements are prepared one at a time on first use, so a missing table
+    only breaks the helpers that query it, not every connection
+    
+    Args:
+        cursor: Cursor on a connection taken from the pool
+        name: Key in PREPARED_STATEMENTS
+    """
+    conn = cursor.connection
+    
+    prepared = _prepared_names.get(conn)
+    if prepared is None:
+        # PREPARE is not transactional: clear anything left on this
+        # connection by an earlier failure before tracking it
+        cursor.execute("DEALLOCATE ALL")
+        prepared = _prepared_names[conn] = set()
+    
+    if name not in prepared:
+        cursor.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]}")
+        prepared.add(name)
+
+def execute_statement(cursor, name: str, params: tuple) -> None:
+    """
+    Run one of PREPARED_STATEMENTS with the given parameters
+    
+    Args:
+        cursor: Cursor on a connection taken from the pool
+        name: Key in PREPARED_STATEMENTS
+        params: Values for $1, $2 ... in order
+    """
+    if not USE_PREPARED_STATEMENTS:
+        cursor.execute(
+            PLAIN_STATEMENTS[name],
+            {f"p{i}": value for i, value in enumerate(params, start=1)}
+        )
+        return
+    
+    prepare_statement(cursor, name)
+    placeholders = ", ".join(["%s"] * len(params))
+    cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+
 @contextmanager
-def get_db_connection():
+def get_db_connection(dict_rows: bool = False):
     """
     Context manager for database connections
-    Automatically handles opening and closing connections
+    Borrows a connection from the pool and returns it when done
+    
+    Args:
+        dict_rows: Return rows as dicts keyed by column name instead of
+            plain tuples (slower, only for callers that need the names)
     
     Usage:
         with get_db_connection() as conn:
@@ -39,17 +150,35 @@ def get_db_connection():
             cursor.execute("SELECT * FROM students")
     """
     conn = None
-    try:
-        conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
-        yield conn
-        conn.commit()
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise e
-    finally:
-        if conn:
-            conn.close()
+    with _pool_slots:
+        pool = get_pool()
+        try:
+            conn = pool.getconn()
+            conn.cursor_factory = RealDictCursor if dict_rows else None
+            yield conn
+            conn.commit()
+        except Exception as e:
+            if conn and not conn.closed:
+                conn.rollback()
+            raise e
+        finally:
+            if conn:
+                # Drop broken connections instead of handing them out again
+                pool.putconn(conn, close=bool(conn.closed))
+
+def warm_up_pool() -> None:
+    """
+    Borrow the pool's initial connections all at once so each one has
+    its statements prepared before the first real request
+    """
+    with ExitStack() as stack:
+        for _ in range(POOL_MIN_CONN):
+            conn = stack.enter_context(get_db_connection())
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            if USE_PREPARED_STATEMENTS:
+                for name in PREPARED_STATEMENTS:
+                    prepare_statement(cursor, name)
 
 # ============================================
 # Database Helper Functions
@@ -69,32 +198,10 @@ def get_or_create_student(email: str, name: str) -> int:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        # Try to get existing student
-        cursor.execute(
-            "SELECT student_id FROM students WHERE email = %s",
-            (email,)
-        )
-        result = cursor.fetchone()
-        
-        if result:
-            # Update last_login
-            cursor.execute(
-                "UPDATE students SET last_login = CURRENT_TIMESTAMP WHERE student_id = %s",
-                (result['student_id'],)
-            )
-            return result['student_id']
-        
-        # Create new student
-        cursor.execute(
-            """
-            INSERT INTO students (email, name, created_at, last_login)
-            VALUES (%s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-            RETURNING student_id
-            """,
-            (email, name)
-        )
+        # Create new student, or update last_login if the email already exists
+        execute_statement(cursor, "upsert_student", (email, name))
         result = cursor.fetchone()
-        return result['student_id']
+        return result[0]
 
 def create_session(student_id: int, ai_client_type: str) -> tuple:
     """
@@ -118,7 +225,7 @@ def create_session(student_id: int, ai_client_type: str) -> tuple:
             "SELECT COUNT(*) as count FROM sessions WHERE student_id = %s",
             (student_id,)
         )
-        count = cursor.fetchone()['count']
+        count = cursor.fetchone()[0]
         session_name = f"Session-{count + 1}"
         
         # Create session
@@ -144,38 +251,33 @@ def save_message(session_id: str, sender_type: str, content: str) -> None:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        # Get next sequence number for this session
-        cursor.execute(
-            "SELECT COALESCE(MAX(sequence_number), 0) + 1 as next_seq FROM messages WHERE session_id = %s",
-            (session_id,)
-        )
-        sequence_number = cursor.fetchone()['next_seq']
-        
-        # Insert message
-        cursor.execute(
-            """
-            INSERT INTO messages (session_id, sender_type, content, sequence_number, created_at)
-            VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
-            """,
-            (session_id, sender_type, content, sequence_number)
-        )
+        # Insert message with the next sequence number in a single round trip
+        execute_statement(cursor, "save_msg", (session_id, sender_type, content))
 
-def get_conversation_history(session_id: str) -> List[Dict]:
+def get_conversation_history(session_id: str, include_timestamps: bool = False) -> List[tuple]:
     """
     Get all messages for a session in order
     
     Args:
         session_id: UUID of the session
+        include_timestamps: Also return each message's formatted timestamp
     
     Returns:
-        List of message dicts with role, content, timestamp
+        List of (role, content) tuples, or (role, content, timestamp) if requested
     """
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
+        # Rows are returned as fetched; the timestamp is formatted by
+        # Postgres only when the caller needs it
+        if include_timestamps:
+            columns = "sender_type AS role, content, to_char(created_at, 'YYYY-MM-DD HH24:MI:SS') AS timestamp"
+        else:
+            columns = "sender_type AS role, content"
+        
         cursor.execute(
-            """
-            SELECT sender_type, content, created_at
+            f"""
+            SELECT {columns}
             FROM messages
             WHERE session_id = %s
             ORDER BY sequence_number ASC
@@ -183,17 +285,7 @@ def get_conversation_history(session_id: str) -> List[Dict]:
             (session_id,)
         )
         
-        messages = cursor.fetchall()
-        
-        # Convert to list of dicts
-        return [
-            {
-                "role": msg['sender_type'],
-                "content": msg['content'],
-                "timestamp": msg['created_at'].strftime("%Y-%m-%d %H:%M:%S")
-            }
-            for msg in messages
-        ]
+        return cursor.fetchall()
 
 def get_user_sessions(email: str) -> List[Dict]:
     """
@@ -205,7 +297,7 @@ def get_user_sessions(email: str) -> List[Dict]:
     Returns:
         List of session dicts with id, name, created_at, message_count
     """
-    with get_db_connection() as conn:
+    with get_db_connection(dict_rows=True) as conn:
         cursor = conn.cursor()
         
         cursor.execute(
@@ -252,10 +344,7 @@ def session_exists(session_id: str) -> bool:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        cursor.execute(
-            "SELECT 1 FROM sessions WHERE session_id = %s",
-            (session_id,)
-        )
+        execute_statement(cursor, "find_session", (session_id,))
         
         return cursor.fetchone() is not None
 
@@ -273,27 +362,50 @@ def get_session_name(session_id: str, email: str) -> Optional[str]:
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        # Get session created_at and total sessions for this user
+        # Number this user's sessions oldest first, same as get_user_sessions
         cursor.execute(
             """
-            SELECT s.created_at,
-                   (SELECT COUNT(*) FROM sessions s2 
-                    JOIN students st2 ON s2.student_id = st2.student_id
-                    WHERE st2.email = %s AND s2.created_at >= s.created_at) as session_number
-            FROM sessions s
-            JOIN students st ON s.student_id = st.student_id
-            WHERE s.session_id = %s AND st.email = %s
+            SELECT session_number
+            FROM (
+                SELECT s.session_id,
+                       ROW_NUMBER() OVER (ORDER BY s.created_at) as session_number
+                FROM sessions s
+                JOIN students st ON s.student_id = st.student_id
+                WHERE st.email = %s
+            ) numbered
+            WHERE session_id = %s
             """,
-            (email, session_id, email)
+            (email, session_id)
         )
         
         result = cursor.fetchone()
         
         if result:
-            return f"Session-{result['session_number']}"
+            return f"Session-{result[0]}"
         
         return None
 
+# ============================================
+# Indexes
+# ============================================
+
+# Names match SQL, so this is a no-op on a database built from that schema
+INDEXES = [
+    # ON CONFLICT (email) and login lookups
+    "CREATE UNIQUE INDEX IF NOT EXISTS students_email_key ON students(email)",
+    # MAX(sequence_number) lookup and ordered history reads
+    "CREATE INDEX IF NOT EXISTS idx_messages_session_sequence ON messages(session_id, sequence_number)",
+    # Per-student session list, newest first
+    "CREATE INDEX IF NOT EXISTS idx_sessions_student_created ON sessions(student_id, created_at DESC)",
+]
+
+def ensure_indexes() -> None:
+    """Create the indexes the helper queries rely on, if they are missing"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        for sql in INDEXES:
+            cursor.execute(sql)
+
 # ============================================
 # Test Connection
 # ============================================
@@ -5,8 +5,9 @@ Now supports email and name inputs
 """
 
 import gradio as gr
-import requests
+import httpx
 from typing import List, Dict
+import time
 import uuid
 
 # ============================================
@@ -14,6 +15,15 @@ import uuid
 # ============================================
 
 API_BASE_URL = "http://localhost:8000"  # FastAPI backend URL
+HEALTH_CHECK_TTL = 10  # Seconds a successful health check is reused
+
+# Shared async HTTP client so calls to the backend reuse keep-alive connections
+# and handlers waiting on the backend do not block each other
+ACLIENT = httpx.AsyncClient(
+    base_url=API_BASE_URL,
+    timeout=30,
+    limits=httpx.Limits(max_keepalive_connections=10, max_connections=20)
+)
 
 # ============================================
 # Global State Variables
@@ -22,6 +32,7 @@ API_BASE_URL = "http://localhost:8000"  # FastAPI backend URL
 current_user_id = None
 current_session_id = None
 current_session_name = None
+last_healthy_check = None  # time.monotonic() of the last successful health check
 
 # ============================================
 # Helper Functions
@@ -31,26 +42,35 @@ def generate_session_id() -> str:
     """Generate a unique session ID"""
     return f"sess_{uuid.uuid4().hex[:8]}"
 
-def check_backend_health() -> bool:
-    """Check if backend is running"""
+async def check_backend_health() -> bool:
+    """Check if backend is running (reuses a recent successful check)"""
+    global last_healthy_check
+    
+    if last_healthy_check is not None and time.monotonic() - last_healthy_check < HEALTH_CHECK_TTL:
+        return True
+    
     try:
-        response = requests.get(f"{API_BASE_URL}/", timeout=2)
-        return response.status_code == 200
+        response = await ACLIENT.get("/", timeout=2)
+        healthy = response.status_code == 200
     except:
         return False
+    
+    if healthy:
+        last_healthy_check = time.monotonic()
+    return healthy
 
 # ============================================
 # API Communication Functions
 # ============================================
 
-def create_new_session(user_id: str, name: str) -> tuple:
+async def create_new_session(user_id: str, name: str) -> tuple:
     """
     Create a new chat session
     Returns: (session_id, session_name, error_message)
     """
     try:
-        response = requests.post(
-            f"{API_BASE_URL}/sessions/new",
+        response = await ACLIENT.post(
+            "/sessions/new",
             json={"user_id": user_id, "name": name},
             timeout=5
         )
@@ -61,48 +81,51 @@ def create_new_session(user_id: str, name: str) -> tuple:
         else:
             return None, None, f"Error: {response.status_code}"
     
-    except requests.exceptions.ConnectionError:
+    except httpx.ConnectError:
         return None, None, "Cannot connect to backend. Is the FastAPI server running?"
     except Exception as e:
         return None, None, f"Error: {str(e)}"
 
-def send_message_to_api(user_id: str, session_id: str, message: str) -> tuple:
+async def send_message_to_api(user_id: str, session_id: str, message: str):
     """
-    Send message to backend and get AI response
-    Returns: (ai_response, error_message)
+    Send message to backend and stream the AI response as it is generated
+    Yields: (text_chunk, error_message)
     """
     try:
-        response = requests.post(
-            f"{API_BASE_URL}/chat",
+        async with ACLIENT.stream(
+            "POST",
+            "/chat/stream",
             json={
                 "user_id": user_id,
                 "session_id": session_id,
                 "message": message
             },
             timeout=30
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            return data["ai_response"], None
-        else:
-            return None, f"Error: {response.status_code} - {response.text}"
+        ) as response:
+            
+            if response.status_code != 200:
+                await response.aread()
+                yield None, f"Error: {response.status_code} - {response.text}"
+                return
+            
+            async for chunk in response.aiter_text():
+                yield chunk, None
     
-    except requests.exceptions.ConnectionError:
-        return None, "Cannot connect to backend. Is the FastAPI server running?"
-    except requests.exceptions.Timeout:
-        return None, "Request timed out. Please try again."
+    except httpx.ConnectError:
+        yield None, "Cannot connect to backend. Is the FastAPI server running?"
+    except httpx.TimeoutException:
+        yield None, "Request timed out. Please try again."
     except Exception as e:
-        return None, f"Error: {str(e)}"
+        yield None, f"Error: {str(e)}"
 
-def get_user_sessions(user_id: str) -> tuple:
+async def get_user_sessions(user_id: str) -> tuple:
     """
     Get all sessions for a user
     Returns: (sessions_list, error_message)
     """
     try:
-        response = requests.get(
-            f"{API_BASE_URL}/users/{user_id}/sessions",
+        response = await ACLIENT.get(
+            f"/users/{user_id}/sessions",
             timeout=5
         )
         
@@ -115,14 +138,14 @@ def get_user_sessions(user_id: str) -> tuple:
     except Exception as e:
         return [], f"Error: {str(e)}"
 
-def get_conversation(user_id: str, session_id: str) -> tuple:
+async def get_conversation(user_id: str, session_id: str) -> tuple:
     """
     Get full conversation for a session
     Returns: (messages, session_name, error_message)
     """
     try:
-        response = requests.get(
-            f"{API_BASE_URL}/conversations/{session_id}",
+        response = await ACLIENT.get(
+            f"/conversations/{session_id}",
             params={"user_id": user_id},
             timeout=5
         )
@@ -140,7 +163,7 @@ def get_conversation(user_id: str, session_id: str) -> tuple:
 # UI Event Handlers
 # ============================================
 
-def start_session(email: str, name: str):
+async def start_session(email: str, name: str):
     """
     Handle user login/start with email and name
     """
@@ -159,14 +182,14 @@ def start_session(email: str, name: str):
         return gr.update(visible=True), gr.update(visible=False), "Please enter a valid email address"
     
     # Check if backend is running
-    if not check_backend_health():
+    if not await check_backend_health():
         return gr.update(visible=True), gr.update(visible=False), "⚠️ Backend server is not running! Please start the FastAPI server first."
     
     # Clean the email
     current_user_id = email.strip().lower()
     
     # Create first session automatically
-    session_id, session_name, error = create_new_session(current_user_id, name.strip())
+    session_id, session_name, error = await create_new_session(current_user_id, name.strip())
     
     if error:
         return gr.update(visible=True), gr.update(visible=False), f"Error: {error}"
@@ -177,7 +200,7 @@ def start_session(email: str, name: str):
     # Hide login screen, show chat screen
     return gr.update(visible=False), gr.update(visible=True), ""
 
-def handle_new_chat():
+async def handle_new_chat():
     """
     Handle "New Chat" button click
     """
@@ -187,7 +210,7 @@ def handle_new_chat():
         return [], "Error: No user logged in", gr.update(choices=[])
     
     # Create new session (name is already stored in database)
-    session_id, session_name, error = create_new_session(current_user_id, "")
+    session_id, session_name, error = await create_new_session(current_user_id, "")
     
     if error:
         return [], f"Error creating session: {error}", gr.update(choices=[])
@@ -196,39 +219,24 @@ def handle_new_chat():
     current_session_name = session_name
     
     # Get updated session list
-    sessions, _ = get_user_sessions(current_user_id)
-    session_choices = [f"{s['session_name']}" for s in sessions]
+    sessions, _ = await get_user_sessions(current_user_id)
+    session_choices = [(s["session_name"], s["session_id"]) for s in sessions]
     
     # Clear chat and update session list
-    return [], f"✅ Started {session_name}", gr.update(choices=session_choices, value=session_name)
+    return [], f"✅ Started {session_name}", gr.update(choices=session_choices, value=session_id)
 
-def load_past_session(session_name: str):
+async def load_past_session(session_id: str):
     """
     Load a past session when user clicks on it in sidebar
+    The dropdown value is the session_id, so no lookup by name is needed
     """
     global current_session_id, current_session_name
     
-    if not session_name or not current_user_id:
+    if not session_id or not current_user_id:
         return [], "Please select a session"
     
-    # Get all sessions to find the session_id
-    sessions, error = get_user_sessions(current_user_id)
-    
-    if error:
-        return [], f"Error loading sessions: {error}"
-    
-    # Find the session_id for this session_name
-    session_id = None
-    for s in sessions:
-        if s["session_name"] == session_name:
-            session_id = s["session_id"]
-            break
-    
-    if not session_id:
-        return [], f"Session '{session_name}' not found"
-    
     # Get conversation
-    messages, sess_name, error = get_conversation(current_user_id, session_id)
+    messages, sess_name, error = await get_conversation(current_user_id, session_id)
     
     if error:
         return [], f"Error loading conversation: {error}"
@@ -247,7 +255,7 @@ def load_past_session(session_name: str):
     
     return chat_history, f"📂 Loaded {sess_name}"
 
-def chat_with_pritam(message: str, history: List[Dict]):
+async def chat_with_pritam(message: str, history: List[Dict]):
     """
     Main chat function - sends message and gets AI response
     This is called every time user sends a message
@@ -265,32 +273,32 @@ def chat_with_pritam(message: str, history: List[Dict]):
     history.append({"role": "user", "content": message})
     yield history
     
-    # Send message to backend
-    ai_response, error = send_message_to_api(current_user_id, current_session_id, message)
+    # Add an empty AI message and fill it in as the response streams
+    history.append({"role": "assistant", "content": ""})
     
-    if error:
-        # Add error message
-        history.append({"role": "assistant", "content": f"⚠️ Error: {error}"})
+    async for chunk, error in send_message_to_api(current_user_id, current_session_id, message):
+        if error:
+            # Replace with error message
+            history[-1]["content"] = f"⚠️ Error: {error}"
+            yield history
+            return
+        
+        history[-1]["content"] += chunk
         yield history
-        return
-    
-    # Add AI response
-    history.append({"role": "assistant", "content": ai_response})
-    yield history
 
-def refresh_session_list():
+async def refresh_session_list():
     """
     Refresh the session list in sidebar
     """
     if not current_user_id:
         return gr.update(choices=[])
     
-    sessions, error = get_user_sessions(current_user_id)
+    sessions, error = await get_user_sessions(current_user_id)
     
     if error:
         return gr.update(choices=[])
     
-    session_choices = [s["session_name"] for s in sessions]
+    session_choices = [(s["session_name"], s["session_id"]) for s in sessions]
     return gr.update(choices=session_choices)
 
 # ============================================
@@ -417,19 +425,14 @@ with gr.Blocks(title="AI Therapy Practice", theme=gr.themes.Soft()) as demo:
     )
     
     # Send message (both button click and Enter key)
-    msg_input.submit(
-        fn=chat_with_pritam,
-        inputs=[msg_input, chatbot],
-        outputs=[chatbot]
-    ).then(
-        fn=lambda: "",
-        outputs=[msg_input]
-    )
-    
-    send_btn.click(
+    # One listener for both triggers; trigger_mode="once" ignores a second
+    # Enter/click while the reply is still streaming
+    gr.on(
+        triggers=[msg_input.submit, send_btn.click],
         fn=chat_with_pritam,
         inputs=[msg_input, chatbot],
-        outputs=[chatbot]
+        outputs=[chatbot],
+        trigger_mode="once"
     ).then(
         fn=lambda: "",
         outputs=[msg_input]
@@ -455,7 +458,7 @@ if __name__ == "__main__":
     print()
     print("=" * 50)
     
-    demo.launch(
+    demo.queue(default_concurrency_limit=8).launch(
         server_name="0.0.0.0",
         server_port=7860,
         show_error=True,